@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Render benchmarks for MiniUI, run without a window.
+
+    python benchmark.py --out bench.json
+    python benchmark.py --quick --compare bench.json
+
+Sessions recorded against the benchmark menu can be replayed headless,
+e.g. to compare throughput and rendered frames between versions:
+
+    python benchmark.py --items 10000 --record session.npy
+    python benchmark.py --items 10000 --replay session.npy --checksums old.npy
+    python benchmark.py --items 10000 --replay session.npy --expect old.npy
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+
+def load_miniui():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mini-ui.py")
+    spec = importlib.util.spec_from_file_location("mini_ui", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(fn, min_time=0.2, max_calls=10000):
+    '''
+    Calls fn until min_time passed or max_calls were made and returns
+    per-call latency statistics in milliseconds.
+    '''
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_calls and (time.perf_counter() - start) < min_time:
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times = np.array(times) * 1000
+    return {
+        "calls": len(times),
+        "mean_ms": float(times.mean()),
+        "p50_ms": float(np.percentile(times, 50)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "fps": float(1000 / times.mean()),
+    }
+
+
+def make_ui(module, n_items, scale, size, native=False, backend=None, first_frame=True):
+    if backend is None:
+        backend = module.OffscreenBackend(copy=False)
+    ui = module.MiniUI(size=(size, size), workers=0, backend=backend)
+    ui.nav_font_scale = scale
+    ui.native_render = native
+    for i in range(n_items - 1):
+        ui.add(['Item {}'.format(i), lambda: None])
+    ui.add(['More', [['Sub {}'.format(i), lambda: None] for i in range(min(n_items, 20))]])
+    if first_frame:
+        ui.show()
+    return ui
+
+
+def bench_case(module, n_items, scale, size, min_time, native=False):
+    ui = make_ui(module, n_items, scale, size, native)
+    img = np.zeros_like(ui.frame)
+    results = {}
+
+    keys = iter([ord('s'), ord('w')] * 10**6)
+    results["show_idle"] = measure(lambda: ui.show(-1), min_time)
+    results["show_active"] = measure(lambda: ui.show(next(keys)), min_time)
+
+    def put_text_uncached():
+        ui.labels.clear()
+        ui.put_text(img, "Benchmark Label 42", (50, 50), scale=ui.nav_font_scale)
+
+    results["put_text"] = measure(
+        lambda: ui.put_text(img, "Benchmark Label 42", (50, 50), scale=ui.nav_font_scale), min_time)
+    results["put_text_uncached"] = measure(put_text_uncached, min_time)
+    results["resize_char"] = measure(lambda: ui.resize_char(ui.font[0], ui.nav_font_scale), min_time)
+
+    def scroll_redraw():
+        ui.invalidate()
+        ui.scroll()
+
+    results["scroll_cached"] = measure(ui.scroll, min_time)
+    results["scroll_redraw"] = measure(scroll_redraw, min_time, max_calls=200)
+    results["show_navigation"] = measure(ui.show_navigation, min_time)
+    ui.shutdown()
+    return results
+
+
+def run(items, scales, sizes, min_time, native=False):
+    module = load_miniui()
+    cases = []
+    for n_items in items:
+        for scale in scales:
+            for size in sizes:
+                name = "items={} scale={} size={}".format(n_items, scale, size)
+                print(name)
+                results = bench_case(module, n_items, scale, size, min_time, native)
+                for metric, r in results.items():
+                    print("  {:<20} {:9.3f} ms  {:10.1f} /s".format(metric, r["mean_ms"], r["fps"]))
+                cases.append({"items": n_items, "scale": scale, "size": size, "results": results})
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "native_render": native,
+        "cases": cases,
+    }
+
+
+def record(path, n_items, scale, size, native=False):
+    module = load_miniui()
+    ui = make_ui(module, n_items, scale, size, native, backend=module.HighGUIBackend(),
+                 first_frame=False)
+    ui.start_recording(path)
+    ui.run()
+    ui.stop_recording()
+    ui.shutdown()
+
+
+def replay(path, n_items, scale, size, native=False, realtime=False, checksums=None, expect=None):
+    module = load_miniui()
+    ui = make_ui(module, n_items, scale, size, native, first_frame=False)
+    result = ui.replay(path, realtime=realtime, checksums=bool(checksums or expect))
+    ui.shutdown()
+    print("{} frames in {:.2f} s, {:.1f} frames/s".format(
+        result["frames"], result["seconds"], result["fps"]))
+
+    sums = result["checksums"]
+    if checksums:
+        np.save(checksums, sums)
+    if expect:
+        old = np.load(expect)
+        n = min(len(old), len(sums))
+        differ = np.flatnonzero(old[:n] != sums[:n])
+        if len(differ) or len(old) != len(sums):
+            first = differ[0] if len(differ) else n
+            print("frames differ from {}, first at frame {}".format(expect, first))
+            return False
+        print("all frames match {}".format(expect))
+    return True
+
+
+def compare(old, new):
+    old_cases = {(c["items"], c["scale"], c["size"]): c["results"] for c in old["cases"]}
+    print("\nchange in mean latency vs. baseline (negative is faster)")
+    for case in new["cases"]:
+        key = (case["items"], case["scale"], case["size"])
+        if key not in old_cases:
+            continue
+        print("items={} scale={} size={}".format(*key))
+        for metric, r in case["results"].items():
+            if metric in old_cases[key]:
+                before = old_cases[key][metric]["mean_ms"]
+                print("  {:<20} {:+7.1f} %".format(metric, (r["mean_ms"] / before - 1) * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[5, 100, 10000])
+    parser.add_argument("--scales", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 500, 1000])
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds spent on each measurement")
+    parser.add_argument("--quick", action="store_true", help="one scale and window size")
+    parser.add_argument("--native", action="store_true", help="render at 1x and upscale the menu")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON results to compare against")
+    parser.add_argument("--record", help="record a session in a window and save it")
+    parser.add_argument("--replay", help="replay a recorded session instead of benchmarking")
+    parser.add_argument("--realtime", action="store_true", help="replay at the recorded speed")
+    parser.add_argument("--checksums", help="save frame checksums of the replay")
+    parser.add_argument("--expect", help="checksums the replayed frames have to match")
+    args = parser.parse_args()
+
+    if args.record or args.replay:
+        # Sessions use the first item count, scale and size
+        options = (args.items[0], args.scales[0], args.sizes[0], args.native)
+        if args.record:
+            record(args.record, *options)
+        else:
+            ok = replay(args.replay, *options, realtime=args.realtime,
+                        checksums=args.checksums, expect=args.expect)
+            raise SystemExit(0 if ok else 1)
+        return
+
+    if args.quick:
+        args.scales, args.sizes = [4], [500]
+    results = run(args.items, args.scales, args.sizes, args.min_time, args.native)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
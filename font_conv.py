@@ -3,16 +3,80 @@
 Created on Sat May  7 01:03:35 2022
 
 @author: herrm
+
+Builds the binary font MiniUI loads at start from a bitmap page.
+
+The page holds the glyphs side by side, GLYPH_WIDTH pixels each, in
+the order of CHARACTERS. Together with the punctuation glyphs below
+this covers printable ASCII (MiniUI draws lower case letters with the
+upper case glyphs). The result is a .npy file with one record per
+glyph (codepoint, bitmap) that MiniUI memory maps instead of parsing.
+
+    python font_conv.py [font.png] [font.npy]
 """
 import cv2
 import numpy as np
 import sys
 
-np.set_printoptions(threshold=sys.maxsize)
+CHARACTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+GLYPH_WIDTH = 5
+
+# Punctuation not on the page, 8 rows of 5 columns ('#' is set)
+PUNCTUATION = {
+    '!': [".#...", ".#...", ".#...", ".#...", ".#...", ".....", ".....", ".#..."],
+    '"': ["#.#..", "#.#..", ".....", ".....", ".....", ".....", ".....", "....."],
+    '#': [".#.#.", ".#.#.", "#####", ".#.#.", ".#.#.", "#####", ".#.#.", ".#.#."],
+    '$': ["..#..", ".####", "#.#..", ".###.", "..#.#", "..#.#", "####.", "..#.."],
+    '%': ["##..#", "##..#", "...#.", "..#..", "..#..", ".#...", "#..##", "#..##"],
+    '&': [".##..", "#..#.", "#..#.", ".##..", "#.#.#", "#..#.", "#..#.", ".##.#"],
+    "'": [".#...", ".#...", ".....", ".....", ".....", ".....", ".....", "....."],
+    '(': ["..#..", ".#...", "#....", "#....", "#....", "#....", ".#...", "..#.."],
+    ')': [".#...", "..#..", "...#.", "...#.", "...#.", "...#.", "..#..", ".#..."],
+    '*': [".....", ".....", "#.#.#", ".###.", "#####", ".###.", "#.#.#", "....."],
+    '+': [".....", ".....", "..#..", "..#..", "#####", "..#..", "..#..", "....."],
+    ',': [".....", ".....", ".....", ".....", ".....", ".....", ".#...", "#...."],
+    '-': [".....", ".....", ".....", "####.", ".....", ".....", ".....", "....."],
+    '.': [".....", ".....", ".....", ".....", ".....", ".....", ".....", ".#..."],
+    '/': ["...#.", "...#.", "..#..", "..#..", ".#...", ".#...", "#....", "#...."],
+    ':': [".....", ".....", ".#...", ".....", ".....", ".#...", ".....", "....."],
+    ';': [".....", ".....", ".#...", ".....", ".....", ".#...", ".#...", "#...."],
+    '<': [".....", "...#.", "..#..", ".#...", "#....", ".#...", "..#..", "...#."],
+    '=': [".....", ".....", "####.", ".....", "####.", ".....", ".....", "....."],
+    '>': [".....", "#....", ".#...", "..#..", "...#.", "..#..", ".#...", "#...."],
+    '?': [".##..", "#..#.", "...#.", "..#..", ".#...", ".#...", ".....", ".#..."],
+    '@': [".###.", "#...#", "#.###", "#.#.#", "#.###", "#....", "#...#", ".###."],
+    '[': ["###..", "#....", "#....", "#....", "#....", "#....", "#....", "###.."],
+    '\\': ["#....", "#....", ".#...", ".#...", "..#..", "..#..", "...#.", "...#."],
+    ']': [".###.", "...#.", "...#.", "...#.", "...#.", "...#.", "...#.", ".###."],
+    '^': [".#...", "#.#..", ".....", ".....", ".....", ".....", ".....", "....."],
+    '_': [".....", ".....", ".....", ".....", ".....", ".....", ".....", "####."],
+    '`': ["#....", ".#...", ".....", ".....", ".....", ".....", ".....", "....."],
+    '{': ["..##.", ".#...", ".#...", "#....", ".#...", ".#...", ".#...", "..##."],
+    '|': [".#...", ".#...", ".#...", ".#...", ".#...", ".#...", ".#...", ".#..."],
+    '}': ["##...", "..#..", "..#..", "...#.", "..#..", "..#..", "..#..", "##..."],
+    '~': [".....", ".....", ".....", ".#.#.", "#.#..", ".....", ".....", "....."],
+}
+
+
+def build(source="font.png", target="font.npy", characters=CHARACTERS, width=GLYPH_WIDTH,
+          extra=PUNCTUATION):
+    page = cv2.imread(source, 0)
+    height = page.shape[0]
+    dtype = np.dtype([('codepoint', '<u4'), ('bitmap', 'u1', (height, width))])
+
+    # All characters of the page, a blank space and the extra glyphs
+    glyphs = np.zeros(len(characters) + 1 + len(extra), dtype=dtype)
+    for i, char in enumerate(characters):
+        glyphs[i]['codepoint'] = ord(char)
+        glyphs[i]['bitmap'] = (page[:, i * width:(i + 1) * width] > 127) * 255
+    glyphs[len(characters)]['codepoint'] = ord(' ')
+    for i, (char, rows) in enumerate(sorted(extra.items()), len(characters) + 1):
+        glyphs[i]['codepoint'] = ord(char)
+        glyphs[i]['bitmap'] = np.array([[c == '#' for c in row] for row in rows]) * 255
 
-font = cv2.imread("font2.png", 0)[::2,::2].astype(np.uint8)
-with open('font_repr.txt', 'w') as f:
-    f.write(repr(font))
+    np.save(target, glyphs)
+    return glyphs
 
 
-    
+if __name__ == "__main__":
+    build(*sys.argv[1:3])
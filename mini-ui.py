@@ -1,21 +1,880 @@
 # -*- coding: utf-8 -*-
+import time
+START_TIME = time.perf_counter()
+
 import cv2
+import glob
 import numpy as np
-import imageio
 import os
+import queue
+import sys
+import threading
+import traceback
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+IMPORT_TIME = time.perf_counter()
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "font.npy")
+
+# One row per recorded frame, key or mouse event, see SessionRecorder
+RECORD_DTYPE = np.dtype([('time', '<f8'), ('kind', 'u1'), ('code', '<i4'),
+                         ('x', '<i4'), ('y', '<i4'), ('flags', '<i4')])
+
+# Added below the selected row (BGR)
+HIGHLIGHT_COLOR = (0, 48, 0, 0)
+
+# Channels written for each text color (BGR)
+COLOR_MASKS = {
+    "b": np.array([1, 0, 0], dtype=np.uint8),
+    "g": np.array([0, 1, 0], dtype=np.uint8),
+    "r": np.array([0, 0, 1], dtype=np.uint8),
+    "w": np.array([1, 1, 1], dtype=np.uint8),
+}
+
+
+class StartupTimer(object):
+    '''
+    Records when the startup phases finished, counted from the moment
+    this module started loading.
+    '''
+    def __init__(self, start=START_TIME):
+        self.start = start
+        self.phases = [('imports', IMPORT_TIME)]
+
+    def mark(self, phase):
+        self.phases.append((phase, time.perf_counter()))
+
+    def time_to_first_frame(self):
+        for phase, t in self.phases:
+            if phase == 'first frame':
+                return (t - self.start) * 1000
+        return None
+
+    def report(self):
+        '''
+        Returns [(phase, ms since start, ms spent in the phase)].
+        '''
+        rows = []
+        last = self.start
+        for phase, t in self.phases:
+            rows.append((phase, (t - self.start) * 1000, (t - last) * 1000))
+            last = t
+        return rows
+
+    def print_report(self):
+        for phase, total, spent in self.report():
+            print("{:<12} {:8.1f} ms  (+{:.1f} ms)".format(phase, total, spent))
+
+
+class LabelCache(object):
+    '''
+    Least recently used cache of rendered label bitmaps, bounded by
+    the total number of bytes held.
+    '''
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        bitmap = self._items.get(key)
+        if bitmap is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return bitmap
+
+    def put(self, key, bitmap):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self._items[key] = bitmap
+        self.nbytes += bitmap.nbytes
+
+        # Evict least recently used, but always keep the newest entry
+        while self.nbytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def discard(self, predicate):
+        '''
+        Removes all entries whose key predicate(key) is true for.
+        '''
+        for key in [key for key in self._items if predicate(key)]:
+            self.nbytes -= self._items.pop(key).nbytes
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+
+class Submenu(object):
+    '''
+    Menu entry target whose entries come from a loader, called the
+    first time the entry is entered. The result is cached until
+    invalidate(). With background=True the loader runs on the UI's
+    executor and a 'Loading' row is shown meanwhile.
+    '''
+    def __init__(self, loader, background=False):
+        self.loader = loader
+        self.background = background
+        self.items = None
+        self.future = None
+        self.loading = None
+
+    def invalidate(self):
+        self.items = None
+        self.future = None
+
+    def get(self, ui, load=True):
+        if self.items is not None or not load:
+            return self.items
+
+        if self.future is None:
+            if not self.background or ui.executor is None:
+                self.items = ui.prepare_menu(list(self.loader()))
+                ui.drop_prefix_indices()
+                ui.invalidate()
+                return self.items
+            self.future = ui.executor.submit(self.loader)
+        if not self.future.done():
+            if self.loading is None:
+                self.loading = [['Loading', ui.back]]
+            return self.loading
+
+        try:
+            items = list(self.future.result())
+        except Exception:
+            traceback.print_exc()
+            items = []
+        self.future = None
+        self.items = ui.prepare_menu(items)
+        ui.drop_prefix_indices()
+        ui.invalidate()
+        return self.items
+
+
+class GlyphPage(object):
+    '''
+    Bitmap page with the glyphs of a codepoint range side by side,
+    cell_width pixels each. The image is read when the first of its
+    glyphs is needed and kept until then.
+    '''
+    def __init__(self, path, first, count, cell_width):
+        self.path = path
+        self.first = first
+        self.count = count
+        self.cell_width = cell_width
+        self.image = None
+
+    def __contains__(self, code):
+        return self.first <= code < self.first + self.count
+
+    def glyph(self, code, shape):
+        '''
+        Returns the glyph for code, scaled to shape (rows, cols).
+        '''
+        if self.image is None:
+            self.image = cv2.imread(self.path, 0)
+        i = code - self.first
+        cell = self.image[:, i * self.cell_width:(i + 1) * self.cell_width]
+        cell = cv2.resize(cell, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+        return (cell > 127).astype(np.uint8) * 255
+
+
+class PrefixIndex(object):
+    '''
+    Sorted array of labels answering prefix queries with bisection.
+    A query can be narrowed within the range of a shorter prefix.
+    '''
+    def __init__(self, labels):
+        self.order = sorted(range(len(labels)), key=labels.__getitem__)
+        self.keys = [labels[i] for i in self.order]
+
+    def search(self, prefix, lo=0, hi=None):
+        '''
+        Returns the (lo, hi) range of keys starting with prefix.
+        '''
+        hi = len(self.keys) if hi is None else hi
+        lo = bisect_left(self.keys, prefix, lo, hi)
+        # Sorts after every other character
+        hi = bisect_left(self.keys, prefix + '\U0010ffff', lo, hi)
+        return lo, hi
+
+    def matches(self, lo, hi):
+        '''
+        Returns the item indices of a range in menu order.
+        '''
+        return sorted(self.order[lo:hi])
+
+
+# Easing curves sampled once, tweens only index into them
+EASING_STEPS = 256
+_x = np.linspace(0, 1, EASING_STEPS + 1)
+EASINGS = {
+    'linear': _x,
+    'sine': (1 - np.cos(_x * np.pi)) / 2,
+    'out_cubic': 1 - (1 - _x) ** 3,
+    'in_out_cubic': np.where(_x < 0.5, 4 * _x ** 3, 1 - (2 - 2 * _x) ** 3 / 2),
+}
+del _x
+
+
+class Tween(object):
+    '''
+    Moves a value from start to end over duration seconds.
+    '''
+    def __init__(self, start, end, duration, easing, begin):
+        self.start = start
+        self.end = end
+        self.duration = duration
+        self.curve = EASINGS[easing]
+        self.begin = begin
+
+    def value(self, now):
+        if self.duration <= 0:
+            return self.end, True
+        progress = (now - self.begin) / self.duration
+        if progress >= 1:
+            return self.end, True
+        step = int(max(progress, 0) * EASING_STEPS)
+        return self.start + (self.end - self.start) * self.curve[step], False
+
+
+class Animator(object):
+    '''
+    Runs any number of named tweens on wall clock time, so animations
+    take the same time regardless of the frame rate. The clock can be
+    swapped, e.g. for replays.
+    '''
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.now = clock()
+        self.tweens = {}
+        self.values = {}
+
+    def animate(self, name, end, duration, easing='sine', start=None):
+        '''
+        Starts animating name towards end, from its current value
+        unless start is given.
+        '''
+        if start is None:
+            start = self.values.get(name, end)
+        self.values[name] = start
+        self.tweens[name] = Tween(start, end, duration, easing, self.now)
+
+    def set(self, name, value):
+        self.tweens.pop(name, None)
+        self.values[name] = value
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def advance(self):
+        '''
+        Reads the clock once for the frame about to be drawn. Tweens
+        started during the frame begin at this time.
+        '''
+        self.now = self.clock()
+
+    def update(self):
+        for name, tween in list(self.tweens.items()):
+            self.values[name], done = tween.value(self.now)
+            if done:
+                del self.tweens[name]
+
+    @property
+    def active(self):
+        return bool(self.tweens)
+
+
+class FrameTimer(object):
+    '''
+    Records how long each stage of MiniUI.show() takes into a fixed
+    size ring buffer. Stages are accumulated between start() and
+    stop(), the time since the previous mark() goes to the named stage.
+    '''
+    STAGES = ('input', 'navigation', 'callback', 'scroll', 'compose', 'present')
+
+    def __init__(self, capacity=512, overlay=False):
+        self.capacity = capacity
+        self.overlay = overlay
+        self.columns = self.STAGES + ('total', 'interval')
+        self.samples = np.zeros((capacity, len(self.columns)))
+        self.count = 0
+        self._column = {name: i for i, name in enumerate(self.columns)}
+        self._row = np.zeros(len(self.columns))
+        self._frame_start = None
+        self._last = None
+
+    def start(self):
+        now = time.perf_counter()
+        self._row[:] = 0
+        if self._frame_start is not None:
+            self._row[-1] = now - self._frame_start
+        self._frame_start = self._last = now
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self._row[self._column[stage]] += now - self._last
+        self._last = now
+
+    def stop(self):
+        self._row[-2] = self._last - self._frame_start
+        self.samples[self.count % self.capacity] = self._row
+        self.count += 1
+
+    def recent(self):
+        '''
+        Returns the recorded samples in seconds, oldest first.
+        '''
+        n = min(self.count, self.capacity)
+        if self.count <= self.capacity:
+            return self.samples[:n]
+        i = self.count % self.capacity
+        return np.concatenate((self.samples[i:], self.samples[:i]))
+
+    def percentiles(self, q=(50, 95, 99)):
+        '''
+        Returns {stage: [percentiles in ms]} over the ring buffer.
+        '''
+        data = self.recent() * 1000
+        if not len(data):
+            return {name: [0.0] * len(q) for name in self.columns}
+        values = np.percentile(data, q, axis=0)
+        return {name: list(values[:, i]) for name, i in self._column.items()}
+
+    def fps(self):
+        intervals = self.recent()[:, -1]
+        intervals = intervals[intervals > 0]
+        return 1 / intervals.mean() if len(intervals) else 0.0
+
+
+class UpdateQueue(object):
+    '''
+    Commands posted from any thread and run by the UI thread in batches,
+    once per frame.
+
+    A command posted with a key replaces the pending command with the
+    same key, so e.g. a label updated many times per frame is changed
+    once. When maxsize commands are pending, drop='new' rejects new
+    commands and drop='old' discards the oldest pending one. Both are
+    counted in dropped.
+    '''
+    def __init__(self, maxsize=1024, drop='new'):
+        self.maxsize = maxsize
+        self.drop = drop
+        self.dropped = 0
+        self.merged = 0
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self._serial = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def post(self, fn, args=(), key=None):
+        '''
+        Queues fn(*args). Returns False if the command was dropped.
+        '''
+        with self.lock:
+            if key is not None and key in self.pending:
+                self.pending[key] = (fn, args)
+                self.pending.move_to_end(key)
+                self.merged += 1
+                return True
+            if len(self.pending) >= self.maxsize:
+                self.dropped += 1
+                if self.drop != 'old':
+                    return False
+                self.pending.popitem(last=False)
+            if key is None:
+                self._serial += 1
+                key = (UpdateQueue, self._serial)
+            self.pending[key] = (fn, args)
+            return True
+
+    def drain(self, limit=None):
+        '''
+        Removes and returns up to limit pending commands [(fn, args)]
+        in the order they were posted.
+        '''
+        with self.lock:
+            if limit is None or limit >= len(self.pending):
+                batch, self.pending = self.pending, OrderedDict()
+                return list(batch.values())
+            return [self.pending.popitem(last=False)[1] for _ in range(limit)]
+
+
+class ValueWidget(object):
+    '''
+    A live value drawn on top of the menu as text. When the value
+    changes only the widget's rectangle of the frame is recomposed.
+
+    Parameters
+    ----------
+    pos : (row, col) of the top left corner in the window
+    source : callable returning the value, polled at most every interval
+             seconds. Without a source, values are pushed with set().
+    interval : minimum seconds between two updates, all values set in
+               between are coalesced into the last one
+    scale, color : text size and color
+    '''
+    def __init__(self, pos, source=None, interval=0.1, scale=2, color="w"):
+        self.pos = pos
+        self.source = source
+        self.interval = interval
+        self.scale = scale
+        self.color = color
+        self.value = None
+        self.bitmap = None
+        self.box = None
+        self.failed = False
+        self._pending = None
+        self._updated = None
+
+    def set(self, value):
+        self._pending = (value,)
+
+    def poll(self, now):
+        '''
+        Takes the newest value if the widget is due for an update.
+        Returns True if it has to be redrawn.
+        '''
+        if self._updated is not None and now - self._updated < self.interval:
+            return False
+        if self._pending is not None:
+            value, = self._pending
+            self._pending = None
+        elif self.source is not None:
+            self._updated = now
+            try:
+                value = self.source()
+            except Exception:
+                # Keep showing the last value, report once per failure streak
+                if not self.failed:
+                    print("widget '{}' - source failed".format(getattr(self.source, '__name__', self.source)))
+                    traceback.print_exc()
+                self.failed = True
+                return False
+            self.failed = False
+        else:
+            return False
+        self._updated = now
+        if value == self.value and self.bitmap is not None:
+            return False
+        self.value = value
+        return True
+
+    def text(self):
+        return "-" if self.value is None else str(self.value)
+
+    def render(self, ui):
+        '''
+        Returns the bitmap (rows, cols, 3) showing the current value.
+        '''
+        # Changing values would only push menu labels out of the cache
+        return ui.render_label(self.text(), self.scale, self.color, cache=False)
+
+
+class Readout(ValueWidget):
+    '''
+    Numeric value with an optional label, e.g. Readout((10, 10), read_temp,
+    label="TEMP ", fmt="{:.1f} C").
+    '''
+    def __init__(self, pos, source=None, fmt="{:.1f}", label="", interval=0.1,
+                 scale=2, color="w"):
+        super().__init__(pos, source, interval, scale, color)
+        self.fmt = fmt
+        self.label = label
+
+    def text(self):
+        value = "-" if self.value is None else self.fmt.format(self.value)
+        return self.label + value
+
+
+class StatusText(Readout):
+    '''
+    Text status, colored by value through colors, e.g. {"OK": "g"}.
+    '''
+    def __init__(self, pos, source=None, colors=None, label="", interval=0.1,
+                 scale=2, color="w"):
+        super().__init__(pos, source, "{}", label, interval, scale, color)
+        self.colors = colors or {}
+
+    def render(self, ui):
+        color = self.colors.get(self.value, self.color)
+        return ui.render_label(self.text(), self.scale, color, cache=False)
+
+
+class ProgressBar(ValueWidget):
+    '''
+    Horizontal bar filled to value / maximum.
+    '''
+    def __init__(self, pos, source=None, size=(12, 200), maximum=1.0, interval=0.1,
+                 color="g"):
+        super().__init__(pos, source, interval, color=color)
+        self.size = size
+        self.maximum = maximum
+
+    def render(self, ui):
+        rows, cols = self.size
+        bitmap = np.zeros((rows, cols, 3), dtype=np.uint8)
+        bitmap[[0, -1], :] = 128
+        bitmap[:, [0, -1]] = 128
+        fraction = min(max((self.value or 0) / self.maximum, 0), 1)
+        fill = int(round((cols - 2) * fraction))
+        bitmap[1:-1, 1:1 + fill] = 255 * COLOR_MASKS.get(self.color, COLOR_MASKS["w"])
+        return bitmap
+
+
+class BackgroundStream(object):
+    '''
+    Decodes a still image, a video or an image sequence on a background
+    thread into a few preallocated frame buffers. The UI thread picks
+    up the newest decoded frame with latest(), which never blocks.
+
+    Parameters
+    ----------
+    source : image or video path, printf style sequence ("f_%03d.png"),
+             glob pattern ("frames/*.png") or list of image paths
+    size : (rows, cols) the frames are resized to
+    buffers : number of preallocated frames, at least 2
+    loop : restart videos and sequences at the end
+    fps : playback rate, defaults to the video's own or 25
+    '''
+    def __init__(self, source, size, buffers=3, loop=True, fps=None):
+        self.source = source
+        self.size = tuple(size)
+        self.loop = loop
+        self.fps = fps
+        self.source_fps = None
+        self.decoded = 0
+        self.skipped = 0
+        self.error = None
+        self.current = None
+
+        # Buffers cycle free -> decoder -> ready -> latest() -> free
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        for _ in range(max(buffers, 2)):
+            self.free.put(np.zeros(self.size + (3,), dtype=np.uint8))
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.decode, name="MiniUI-background", daemon=True)
+        self.thread.start()
+
+    @property
+    def running(self):
+        return self.thread.is_alive()
+
+    def latest(self):
+        '''
+        Returns the newest decoded frame, or None if nothing new was
+        decoded since the last call. The frame stays valid until the
+        next frame is returned.
+        '''
+        frame = None
+        while True:
+            try:
+                newer = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            if frame is not None:
+                # UI was too slow for this one
+                self.free.put(frame)
+                self.skipped += 1
+            frame = newer
+        if frame is not None:
+            if self.current is not None:
+                self.free.put(self.current)
+            self.current = frame
+        return frame
+
+    def stop(self, timeout=1.0):
+        self.stopped.set()
+        self.thread.join(timeout)
+
+    def decode(self):
+        try:
+            due = time.perf_counter()
+            for image in self.read():
+                buffer = self.acquire()
+                if buffer is None:
+                    return
+                cv2.resize(image, (self.size[1], self.size[0]), dst=buffer,
+                           interpolation=cv2.INTER_AREA)
+
+                # Pace videos and sequences, but don't catch up on lost time
+                wait = due - time.perf_counter()
+                if wait > 0 and self.stopped.wait(wait):
+                    return
+                self.ready.put(buffer)
+                self.decoded += 1
+                delay = 1 / (self.fps or self.source_fps or 25)
+                due = max(due + delay, time.perf_counter())
+        except Exception as error:
+            self.error = error
+            print("background '{}' - decoding failed".format(self.source))
+            traceback.print_exc()
+
+    def acquire(self):
+        # Waits for a free buffer, None once stopped
+        while not self.stopped.is_set():
+            try:
+                return self.free.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def read(self):
+        '''
+        Yields the decoded images in playback order.
+        '''
+        source = self.source
+        if not isinstance(source, str) or '*' in source:
+            paths = sorted(glob.glob(source)) if isinstance(source, str) else list(source)
+            if not paths:
+                raise IOError("no images found for {}".format(source))
+            while not self.stopped.is_set():
+                for path in paths:
+                    image = cv2.imread(path, cv2.IMREAD_COLOR)
+                    if image is not None:
+                        yield image
+                if not self.loop:
+                    return
+            return
+
+        if '%' not in source and cv2.haveImageReader(source):
+            image = cv2.imread(source, cv2.IMREAD_COLOR)
+            if image is None:
+                raise IOError("can't read {}".format(source))
+            yield image
+            return
+
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise IOError("can't open {}".format(source))
+        try:
+            self.source_fps = capture.get(cv2.CAP_PROP_FPS) or None
+            count = 0
+            while not self.stopped.is_set():
+                ok, image = capture.read()
+                if ok:
+                    count += 1
+                    yield image
+                elif self.loop and count:
+                    # Reopening works for videos and sequences alike
+                    capture.release()
+                    capture = cv2.VideoCapture(source)
+                    count = 0
+                else:
+                    return
+        finally:
+            capture.release()
+
+
+class LatencyTracer(object):
+    '''
+    Measures input to display latency, from the moment an input event
+    reaches MiniUI until the first frame presented after handling it.
+    Latencies go into a fixed size ring buffer, presents slower than
+    threshold seconds are flagged in slow.
+    '''
+    EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self, capacity=4096, threshold=0.05):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.samples = np.zeros(capacity)
+        self.count = 0
+        self.presents = 0
+        self.unchanged = 0
+        self.pending = []
+        self.slow = deque(maxlen=256)
+
+    def arrived(self, t):
+        self.pending.append(t)
+
+    def presented(self):
+        self.presents += 1
+        if not self.pending:
+            return
+        now = time.perf_counter()
+        for t in self.pending:
+            self.samples[self.count % self.capacity] = now - t
+            self.count += 1
+        worst = now - min(self.pending)
+        if worst > self.threshold:
+            self.slow.append((self.presents, worst * 1000))
+        self.pending = []
+
+    def discard(self):
+        # Input that did not change the frame has nothing to wait for
+        self.unchanged += len(self.pending)
+        self.pending = []
+
+    def recent(self):
+        '''
+        Returns the recorded latencies in milliseconds.
+        '''
+        return self.samples[:min(self.count, self.capacity)] * 1000
+
+    def percentiles(self, q=(50, 95, 99)):
+        samples = self.recent()
+        if not len(samples):
+            return [0.0] * len(q)
+        return list(np.percentile(samples, q))
+
+    def histogram(self):
+        '''
+        Returns [(upper bound in ms, count)], the last bound is inf.
+        '''
+        edges = (0,) + self.EDGES_MS + (np.inf,)
+        counts, _ = np.histogram(self.recent(), bins=edges)
+        return list(zip(edges[1:], counts))
+
+    def print_report(self):
+        print("input latency, {} events, {} without visible change".format(self.count, self.unchanged))
+        print("p50 {:.1f} ms  p95 {:.1f} ms  p99 {:.1f} ms".format(*self.percentiles()))
+        for bound, count in self.histogram():
+            print("  <= {:>6} ms {:6}".format(bound, count))
+        print("{} frames over {:.0f} ms".format(len(self.slow), self.threshold * 1000))
+
+
+class SessionRecorder(object):
+    '''
+    Records the keys and mouse events MiniUI consumes together with the
+    time of every frame, see MiniUI.start_recording(). Sessions are
+    saved as a .npy array of RECORD_DTYPE.
+    '''
+    FRAME, KEY, MOUSE = 0, 1, 2
+
+    def __init__(self, path, now):
+        self.path = path
+        self.start = now
+        self.input_start = time.perf_counter()
+        self.rows = []
+
+    def key(self, key):
+        self.rows.append((time.perf_counter() - self.input_start, self.KEY, key, 0, 0, 0))
+
+    def mouse(self, event, x, y, flags):
+        self.rows.append((time.perf_counter() - self.input_start, self.MOUSE, event, x, y, flags))
+
+    def frame(self, now):
+        self.rows.append((now - self.start, self.FRAME, 0, 0, 0, 0))
+
+    def save(self):
+        np.save(self.path, np.array(self.rows, dtype=RECORD_DTYPE))
+        return self.path
+
+
+class HighGUIBackend(object):
+    '''
+    Shows frames in an OpenCV HighGUI window.
+    '''
+    every_frame = False
+
+    def open(self, ui):
+        self.window_name = ui.window_name
+        cv2.namedWindow(self.window_name)
+        cv2.setMouseCallback(self.window_name, ui.onMouse)
+
+    def present(self, frame):
+        cv2.imshow(self.window_name, frame)
+
+    def wait_key(self, delay):
+        return cv2.waitKey(delay)
+
+    def close(self):
+        cv2.destroyWindow(self.window_name)
+
+
+class OffscreenBackend(object):
+    '''
+    Keeps the composed frame in memory instead of showing it, for
+    machines without a display. With copy=False, frame is the UI's
+    own buffer and changes with the next show().
+    '''
+    every_frame = False
+
+    def __init__(self, copy=True):
+        self.copy = copy
+        self.frame = None
+        self.frame_count = 0
+
+    def open(self, ui):
+        pass
+
+    def present(self, frame):
+        self.frame = frame.copy() if self.copy else frame
+        self.frame_count += 1
+
+    def wait_key(self, delay):
+        time.sleep(delay / 1000)
+        return -1
+
+    def close(self):
+        pass
+
+
+class FrameSink(OffscreenBackend):
+    '''
+    Writes every frame to a video file, an image sequence
+    ('frames/%05d.png') or an existing cv2.VideoWriter.
+    '''
+    every_frame = True
+
+    def __init__(self, target, fps=30, fourcc="mp4v"):
+        super().__init__(copy=False)
+        self.target = target
+        self.fps = fps
+        self.fourcc = fourcc
+        self.writer = target if isinstance(target, cv2.VideoWriter) else None
+
+    def present(self, frame):
+        super().present(frame)
+        if isinstance(self.target, str) and "%" in self.target:
+            cv2.imwrite(self.target % (self.frame_count - 1), frame)
+            return
+        if self.writer is None:
+            self.writer = cv2.VideoWriter(self.target, cv2.VideoWriter_fourcc(*self.fourcc),
+                                          self.fps, (frame.shape[1], frame.shape[0]))
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
 
 
 class MiniUI(object):
-    def __init__(self, size=(500, 500), window_name="MiniUI"):
+    def __init__(self, size=(500, 500), window_name="MiniUI",
+                 label_cache_bytes=8 * 1024 * 1024, workers=2, executor=None, backend=None,
+                 report_startup=False):
         # Window
         
         self.window_size_x = size[0]
         self.window_size_y = size[1]
         self.bg = np.zeros((self.window_size_x, self.window_size_y, 3), dtype=np.uint8)
+        self.background = None
         self.ui = np.zeros_like(self.bg, dtype=np.uint8)
+        self.plane = None
         self.window_name = window_name
-        self.window = cv2.namedWindow(self.window_name)
+        self.startup = StartupTimer()
+        self.report_startup = report_startup
+        self.labels = LabelCache(label_cache_bytes)
         self.load_font()
+        self.startup.mark('font')
         
         # Navigation
         self.nav_centered= False
@@ -23,7 +882,26 @@ class MiniUI(object):
         self.nav_spacing = 4
         self.last_selected = 0
 
+        # Draw the menu at 1x and upscale it by nav_font_scale in one pass
+        self.native_render = False
+        self._ui_scaled = None
+
         self.selected = [0, 0, 0, 0]  
+        self.nav_offset = [0, 0, 0, 0]
+
+        # Type-ahead filter on one level, see handle_filter_input()
+        self.filter_query = None
+        self.filter_typing = False
+        self.filter_depth = 0
+        self.filter_matches = []
+        self.filter_range = (0, None)
+        self._prefix_indices = {}
+
+        # Mouse input, coalesced per frame and hit tested on the layout
+        self.hit_index = {}
+        self.mouse_pos = None
+        self.mouse_clicks = deque()
+        self.hovered = None
         self.level = 0
         self.nav_items = []
         self.key = None
@@ -35,8 +913,53 @@ class MiniUI(object):
             
             
         self.t = 0.0
-            
-        cv2.setMouseCallback(self.window_name, self.onMouse)
+
+        # Animations: menu slide, selection highlight and menu fade
+        self.animator = Animator()
+        self.slide_duration = 0.2
+        self.highlight_duration = 0.1
+        self.highlight_bar = True
+        self._slide_target = 0
+        self._highlight_target = None
+
+        # Retained mode: reuse the last frame while nothing changed
+        self.retained = True
+        self._frame_state = None
+        self._nav_version = 0
+
+        # Compositing: background, menu, then overlays into one buffer
+        self.frame = np.zeros_like(self.bg)
+        self.overlays = []
+        self.widgets = []
+
+        # Callbacks run on a worker pool, results are handled in show()
+        if executor is None and workers > 0:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="MiniUI")
+        self.executor = executor
+        self.inline_callbacks = {self.back, self.close}
+        self.busy = {}
+        self.on_result = None
+        self.on_error = None
+
+        # Optional per stage frame timing and input latency tracing
+        self.timer = None
+        self.latency = None
+        self.frames = 0
+        self.missed_frames = 0
+
+        # Commands posted by other threads, see post()
+        self.updates = UpdateQueue()
+        self.update_batch = None
+        self.notice = None
+        self._notice_widget = None
+
+        # Output backend and programmatically injected input
+        self.recording = None
+        self.events = deque()
+        self.backend = HighGUIBackend() if backend is None else backend
+        self.backend_open = False
+        self._first_frame = True
+        self.startup.mark('init')
         
     def add(self, entry):
         '''
@@ -46,111 +969,767 @@ class MiniUI(object):
         ----------
         entry : ['Name', callback_function]
              or ['Name', [['name', cb], ['name', cb]]]
+             or ['Name', Submenu(loader)]
 
+        Submenus can be nested to any depth.
         '''
         
-        # If second element is list, append back button
+        # If second element is list, append back buttons
         if isinstance(entry[1], list):
-            entry[1].append(['Back', self.back])
+            self.prepare_menu(entry[1])
             
         self.nav_items.append(entry)
+        self.drop_prefix_indices()
+        self.invalidate()
+
+    def prepare_menu(self, items):
+        '''
+        Appends a back button to a submenu and all its nested submenus.
+        '''
+        for entry in items:
+            if isinstance(entry[1], list):
+                self.prepare_menu(entry[1])
+        if not items or items[-1][1] != self.back:
+            items.append(['Back', self.back])
+        return items
+
+    def menu_at(self, depth, load=True):
+        '''
+        Returns the entries at depth along the selection path, or None
+        if the path does not lead to a menu. With load=False, lazy
+        submenus that were not entered yet count as empty.
+        '''
+        items = self.nav_items
+        for d in range(depth):
+            try:
+                target = items[self.selected[d]][1]
+            except IndexError:
+                return None
+            if isinstance(target, Submenu):
+                items = target.get(self, load)
+                if items is None:
+                    return []
+            elif isinstance(target, list):
+                items = target
+            else:
+                return None
+        return items
+
+    def ensure_depth(self, depth):
+        while len(self.selected) <= depth:
+            self.selected.append(0)
+            self.nav_offset.append(0)
+
+    def invalidate(self):
+        '''
+        Forces a redraw on the next show(). Call this after changing
+        nav_items or bg in place.
+        '''
+        self._nav_version += 1
+
+    def add_overlay(self, img, alpha=None):
+        '''
+        Adds an overlay layer drawn on top of the menu.
+
+        Parameters
+        ----------
+        img : image with the same shape as the window
+        alpha : None to add saturating, or 0..1 to blend
+        '''
+        self.overlays.append((img, alpha))
+        self.invalidate()
+        return img
+
+    def remove_overlay(self, img):
+        self.overlays = [o for o in self.overlays if o[0] is not img]
+        self.invalidate()
+
+    def set_background(self, source, **kwargs):
+        '''
+        Streams the background from an image, a video or an image
+        sequence, see BackgroundStream for the options. None switches
+        back to a black background.
+        '''
+        if self.background is not None:
+            self.background.stop()
+            self.background = None
+        if source is None:
+            self.bg = np.zeros_like(self.frame)
+        else:
+            self.background = BackgroundStream(
+                source, (self.window_size_x, self.window_size_y), **kwargs)
+        self.invalidate()
+
+    def update_background(self):
+        # Swap in the newest decoded frame, if any
+        if self.background is not None:
+            frame = self.background.latest()
+            if frame is not None:
+                self.bg = frame
+                self.invalidate()
+
+    def add_widget(self, widget):
+        '''
+        Adds a live value widget (ValueWidget or a subclass)
+        drawn on top of the overlays.
+        '''
+        self.widgets.append(widget)
+        self.invalidate()
+        return widget
+
+    def remove_widget(self, widget):
+        self.widgets.remove(widget)
+        self.invalidate()
+
+    def update_widgets(self):
+        '''
+        Polls the widgets and rerenders the ones whose value changed.
+        Returns the rectangles (row0, col0, row1, col1) of the frame
+        that have to be recomposed.
+        '''
+        now = self.animator.now
+        dirty = []
+        for widget in self.widgets:
+            if not widget.poll(now):
+                continue
+            old = widget.box
+            widget.bitmap = widget.render(self)
+            x, y = widget.pos
+            widget.box = (x, y, x + widget.bitmap.shape[0], y + widget.bitmap.shape[1])
+            if old is not None:
+                # The old value may have covered more pixels
+                dirty.append((min(old[0], x), min(old[1], y),
+                              max(old[2], widget.box[2]), max(old[3], widget.box[3])))
+            else:
+                dirty.append(widget.box)
+        return dirty
 
+    def compose(self, region=None):
+        '''
+        Composes background, menu, overlays and widgets into the
+        preallocated frame buffer with saturating arithmetic. With
+        region=(row0, col0, row1, col1) only that part is recomposed.
+        '''
+        r0, c0, r1, c1 = region or (0, 0, self.window_size_x, self.window_size_y)
+        r0, c0 = max(r0, 0), max(c0, 0)
+        rect = (slice(r0, r1), slice(c0, c1))
+        frame = self.frame[rect]
+        if frame.size == 0:
+            return self.frame
+
+        fade = self.animator.get('fade', 1.0)
+        if fade >= 1:
+            cv2.add(self.bg[rect], self.ui[rect], dst=frame)
+        else:
+            cv2.addWeighted(self.bg[rect], 1.0, self.ui[rect], fade, 0, dst=frame)
+        if self.highlight_bar:
+            self.draw_highlight(frame, (r0, c0))
+        for img, alpha in self.overlays:
+            if alpha is None:
+                cv2.add(frame, img[rect], dst=frame)
+            else:
+                cv2.addWeighted(frame, 1 - alpha, img[rect], alpha, 0, dst=frame)
+        for widget in self.widgets:
+            if widget.bitmap is not None:
+                self.blit(frame, widget.bitmap, widget.pos[0] - r0, widget.pos[1] - c0)
+        return self.frame
+
+    def frame_state(self):
+        '''
+        Returns everything the composed frame depends on.
+        '''
+        return (tuple(self.selected), self.level, self.t,
+                self.animator.get('highlight'), self.animator.get('fade'),
+                id(self.nav_items), len(self.nav_items), self._nav_version,
+                id(self.bg), self.nav_font_scale, self.nav_spacing,
+                self.nav_origin, self.nav_centered, self.native_render)
  
-    def show(self, key):
-        self.ui *= 0
-        self.key = key
+    def inject_key(self, key):
+        '''
+        Queues a key press, consumed by the next show() without a key.
+        '''
+        self.events.append(('key', key, time.perf_counter()))
+
+    def inject_mouse(self, event, x, y, flags=0):
+        '''
+        Queues a mouse event, delivered to onMouse on the next show().
+        '''
+        self.events.append(('mouse', (event, x, y, flags, None), time.perf_counter()))
 
+    def process_events(self, key):
+        # Deliver queued mouse events and at most one key per frame
+        if key is not None and key != -1:
+            self.trace_input()
+        while self.events:
+            kind, value, arrival = self.events[0]
+            if kind == 'key':
+                if key is not None and key != -1:
+                    break
+                key = value
+                self.trace_input(arrival)
+            else:
+                self.onMouse(*value, arrival=arrival)
+            self.events.popleft()
+        return key
+
+    def open(self):
+        '''
+        Opens the backend (e.g. creates the window). Happens on the
+        first show() unless called before.
+        '''
+        if not self.backend_open:
+            self.backend.open(self)
+            self.backend_open = True
+            self.startup.mark('window')
+
+    def show(self, key=-1):
+        if not self.backend_open:
+            self.open()
+        timer = self.timer
+        if timer is not None:
+            timer.start()
+
+        self.key = self.process_events(key)
+        if self.recording is not None and self.key is not None and self.key != -1:
+            self.recording.key(self.key)
+        self.apply_mouse()
+        self.poll_callbacks()
+        self.apply_updates()
         self.handle_input()
+        if timer is not None:
+            timer.mark('input')
+
         self.show_navigation()
-        self.scroll()
-        
-        
-        cv2.imshow(self.window_name, self.bg + self.ui)
+        self.update_animations()
+        self.update_background()
+        dirty = self.update_widgets()
+        if timer is not None:
+            timer.mark('navigation')
+
+        state = self.frame_state()
+        if not self.retained or state != self._frame_state:
+            self.scroll()
+            self.update_highlight_target()
+            if timer is not None:
+                timer.mark('scroll')
+            self.compose()
+            if timer is not None:
+                if timer.overlay:
+                    self.draw_timing(self.frame, timer)
+                timer.mark('compose')
+            self._frame_state = state
+            self.present()
+            if self._first_frame:
+                self._first_frame = False
+                self.startup.mark('first frame')
+                if self.report_startup:
+                    self.startup.print_report()
+        elif dirty:
+            # Only widgets changed, recompose just their rectangles
+            for region in dirty:
+                self.compose(region)
+            if timer is not None:
+                timer.mark('compose')
+            self.present()
+        elif self.backend.every_frame:
+            self.present()
+
+        if self.latency is not None:
+            self.latency.discard()
+        if self.recording is not None:
+            self.recording.frame(self.animator.now)
+        if timer is not None:
+            timer.mark('present')
+            timer.stop()
         
         if self.close_selected:
             return 'exit'
         else:
             return 'running'
 
-    def scroll(self):
+    def start_recording(self, path):
+        '''
+        Records the session (keys, mouse events and frame times) until
+        stop_recording(), which saves it to path.
+        '''
+        self.recording = SessionRecorder(path, self.animator.now)
+        return self.recording
 
-        img_nav1 = np.zeros_like(self.ui)
-        img_nav2 = np.zeros_like(self.ui)
-        
-        items1 = [i[0] for i in self.nav_items]
-        items2 = []
+    def stop_recording(self):
+        if self.recording is None:
+            return None
+        path = self.recording.save()
+        self.recording = None
+        return path
+
+    def replay(self, path, realtime=False, checksums=False):
+        '''
+        Replays a recorded session. Events are fed in the frames they
+        were consumed in and the animator runs on the recorded frame
+        times, so the same menu gives the same frames as when recording.
+
+        Parameters
+        ----------
+        path : session saved by stop_recording()
+        realtime : wait for the recorded frame times, otherwise frames
+                   are shown as fast as possible
+        checksums : collect a CRC32 of every frame
+
+        Returns
+        -------
+        {'frames': n, 'seconds': s, 'fps': f, 'checksums': array or None}
+        '''
+        records = np.load(path).tolist()
+        clock = self.animator.clock
+        now = [0.0]
+        self.animator.clock = lambda: now[0]
+        sums = []
+        frames = 0
+        start = time.perf_counter()
         try:
-            element = self.nav_items[self.selected[0]][1]
-        except:
-            element = []
-        
-        if isinstance(element, list): # item is list
-            # get List Text elements
-            items2 = [i[0] for i in element]
-            
-            
-        # render level 1 nav
-        for i, entry in enumerate(items1):
-            col = 'g' if i == self.selected[0] else 'w'
-            pos = (self.nav_origin[0] + i * (self.nav_font_scale * 8 + self.nav_spacing), self.nav_origin[1])
-            self.put_text(img_nav1 , entry, pos, scale=self.nav_font_scale,
-                          color = col, centered = self.nav_centered)
-            
-        # render level 2 nav
-        for i, entry in enumerate(items2):
-            col = 'g' if i == self.selected[1] else 'w'
-            pos = (self.nav_origin[0] + i * (self.nav_font_scale * 8 + self.nav_spacing), self.nav_origin[1])
-            self.put_text(img_nav2 , entry, pos, scale=self.nav_font_scale,
-                          color = col, centered = self.nav_centered)
-            
-            
-        img_plane = np.hstack((img_nav1, img_nav2))
-        size_x = self.window_size_x 
-        self.t += (self.level - 0.5) * 0.7
-        self.t = max(min(self.t, 1), 0)
-        val =  (1 + np.sin(((self.t) * np.pi) - np.pi/2))  * size_x / 2
-        pos_x =  int(val) #int((1 + np.sin(self.t/10)) * size_x / 2)
-        self.ui = img_plane[:,pos_x:pos_x+size_x,:]
-        
+            for t, kind, code, x, y, flags in records:
+                if kind == SessionRecorder.KEY:
+                    self.inject_key(code)
+                elif kind == SessionRecorder.MOUSE:
+                    self.inject_mouse(code, x, y, flags)
+                else:
+                    now[0] = t
+                    if realtime:
+                        delay = start + t - time.perf_counter()
+                        if delay > 0:
+                            self.backend.wait_key(max(1, int(delay * 1000)))
+                    status = self.show()
+                    frames += 1
+                    if checksums:
+                        sums.append(zlib.crc32(self.frame))
+                    if status == 'exit':
+                        break
+        finally:
+            self.animator.clock = clock
+        seconds = time.perf_counter() - start
+        return {'frames': frames, 'seconds': seconds, 'fps': frames / max(seconds, 1e-9),
+                'checksums': np.array(sums, dtype=np.uint32) if checksums else None}
+
+    def animating(self):
+        '''
+        True while something is animated, input is queued or the
+        background is playing.
+        '''
+        return (self.animator.active or bool(self.events) or bool(self.updates)
+                or (self.background is not None and self.background.running))
+
+    def run(self, fps=60, idle_fps=10, exit_key=ord('x')):
+        '''
+        Runs show() until the menu or exit_key closes the UI. While a
+        filter is typed, exit_key goes to the filter instead.
+
+        While animating, frames are scheduled at fps and frames that do
+        not fit the budget are counted as missed. Otherwise the loop
+        just waits for input, polling at idle_fps.
+
+        Returns
+        -------
+        {'frames': n, 'missed_frames': n}
+        '''
+        budget = 1 / fps
+        self.frames = 0
+        self.missed_frames = 0
+        key = -1
+        while True:
+            start = time.perf_counter()
+            if self.show(key) == 'exit':
+                break
+            self.frames += 1
+
+            elapsed = time.perf_counter() - start
+            if self.animating():
+                self.missed_frames += int(elapsed // budget)
+                delay = budget - elapsed % budget
+            else:
+                delay = 1 / idle_fps - elapsed
+            key = self.backend.wait_key(max(1, int(round(delay * 1000))))
+            if key == exit_key and not self.filter_typing:
+                break
+
+        return {'frames': self.frames, 'missed_frames': self.missed_frames}
+
+    def enable_timing(self, capacity=512, overlay=False):
+        '''
+        Starts recording per stage frame timings, optionally with a
+        FPS / frame time overlay. Returns the FrameTimer.
+        '''
+        self.timer = FrameTimer(capacity, overlay)
+        return self.timer
+
+    def disable_timing(self):
+        self.timer = None
+
+    def enable_latency(self, threshold=0.05, capacity=4096):
+        '''
+        Starts tracing input to display latency, flagging frames that
+        show input later than threshold seconds. Returns the
+        LatencyTracer.
+        '''
+        self.latency = LatencyTracer(capacity, threshold)
+        return self.latency
+
+    def disable_latency(self):
+        self.latency = None
+
+    def trace_input(self, arrival=None):
+        if self.latency is not None:
+            self.latency.arrived(time.perf_counter() if arrival is None else arrival)
+
+    def present(self):
+        self.backend.present(self.frame)
+        if self.latency is not None:
+            self.latency.presented()
+
+    def draw_timing(self, img, timer):
+        stats = timer.percentiles((50,))
+        text = "FPS {} MS {}".format(int(round(timer.fps())), int(round(stats['total'][0])))
+        self.put_text(img, text, (4, 4), scale=2, color='g')
+
+    def render_factor(self):
+        '''
+        Returns how much the rendered menu is upscaled to the window.
+        '''
+        return self.nav_font_scale if self.native_render else 1
+
+    def layout(self):
+        '''
+        Returns (glyph scale, spacing, origin, row height) in pixels of
+        the buffer the menu is rendered into.
+        '''
+        factor = self.render_factor()
+        scale = self.nav_font_scale // factor
+        spacing = max(1, self.nav_spacing // factor) if factor > 1 else self.nav_spacing
+        origin = (self.nav_origin[0] // factor, self.nav_origin[1] // factor)
+        return scale, spacing, origin, scale * self.font.shape[1] + spacing
+
+    def scroll(self):
+        factor = self.render_factor()
+        rows = -(-self.window_size_x // factor)
+        width = -(-self.window_size_y // factor)
+        if self.plane is None or self.plane.shape[:2] != (rows, 2 * width):
+            self.plane = np.zeros((rows, 2 * width, 3), dtype=np.uint8)
+            self._plane_state = [None, None]
+            self._plane_base = 0
+            self._plane_pos = 0
+            self._plane_width = width * factor
+
+        # The plane holds the two levels the slide is between
+        base = max(0, int(np.ceil(self.t)) - 1)
+        self.ensure_depth(base + 1)
+
+        # Redraw a level only when its content changed
+        layout = (self._nav_version, id(self.nav_items), len(self.nav_items),
+                  self.nav_font_scale, self.nav_spacing, self.nav_origin, self.nav_centered,
+                  factor)
+        for half in (0, 1):
+            depth = base + half
+            state = layout + (depth, tuple(self.selected[:depth + 1]))
+            if self._plane_state[half] != state:
+                items = self.menu_at(depth, load=depth <= self.level) or []
+                self.render_level(self.plane[:, half * width:(half + 1) * width],
+                                  items, self.selected[depth], depth)
+                self._plane_state[half] = state
+
+        pos_x =  int((self.t - base) * width)
+        view = self.plane[:, pos_x:pos_x + width]
+        if factor == 1:
+            self.ui = view
+        else:
+            # Integer nearest neighbour upscale into a reused buffer
+            shape = (rows * factor, width * factor, 3)
+            if self._ui_scaled is None or self._ui_scaled.shape != shape:
+                self._ui_scaled = np.zeros(shape, dtype=np.uint8)
+                self._ui_scaled_state = None
+            state = (tuple(self._plane_state), pos_x)
+            if self._ui_scaled_state != state:
+                cv2.resize(view, shape[1::-1], dst=self._ui_scaled, interpolation=cv2.INTER_NEAREST)
+                self._ui_scaled_state = state
+            self.ui = self._ui_scaled[:self.window_size_x, :self.window_size_y]
+        self._plane_base = base
+        self._plane_pos = pos_x * factor
+
+    def render_level(self, img, items, selected, level):
+        '''
+        Clears img and draws the rows of one menu level that fit into
+        the window. The viewport follows the selection.
+        '''
+        img[...] = 0
+        scale, spacing, origin, row_height = self.layout()
+        rows = max(1, (img.shape[0] - origin[0]) // row_height)
+
+        visible = self.visible_rows(items, level)
+        position = bisect_left(visible, selected)
+        first = min(self.nav_offset[level], max(position, 0))
+        first = max(first, position - rows + 1)
+        first = max(0, min(first, len(visible) - rows))
+        self.nav_offset[level] = first
+
+        # Only rows intersecting the window, the last one may be cut off
+        shown = visible[first:first + rows + 1]
+        boxes = np.zeros((len(shown), 4), dtype=np.intp)
+        for row, i in enumerate(shown):
+            entry = items[i]
+            if id(entry) in self.busy:
+                col = 'b'
+            else:
+                col = 'g' if i == selected else 'w'
+            pos = (origin[0] + row * row_height, origin[1])
+            boxes[row] = self.put_text(img, entry[0], pos, scale=scale,
+                                       color = col, centered = self.nav_centered)
+
+        # Hit test index in window pixels, rows are hit over their full height
+        boxes[:, 2] = boxes[:, 0] + row_height
+        boxes *= self.render_factor()
+        self.hit_index[level] = (boxes, np.asarray(shown, dtype=np.intp))
+
+        if len(visible) > rows:
+            self.draw_scrollbar(img, first, rows, len(visible))
+        if self.filter_query is not None and level == self.filter_depth:
+            factor = self.render_factor()
+            self.put_text(img, "FIND " + self.filter_query, (origin[0] - 24 // factor, origin[1]),
+                          scale=max(1, 2 // factor), color='r')
+
+    def visible_rows(self, items, level):
+        '''
+        Returns the indices of the rows shown at level, in menu order.
+        '''
+        if self.filter_query is not None and level == self.filter_depth:
+            return self.filter_matches
+        return range(len(items))
+
+    def draw_scrollbar(self, img, first, rows, total):
+        _, spacing, origin, _ = self.layout()
+        factor = self.render_factor()
+        left, right = -max(6 // factor, 2), -max(2 // factor, 1)
+        top = origin[0]
+        height = img.shape[0] - top - spacing
+        thumb_top = top + height * first // total
+        thumb_height = max(spacing, height * rows // total)
+        img[top:top + height, left:right] = 64
+        img[thumb_top:thumb_top + thumb_height, left:right] = 200
+
+    def update_animations(self):
+        self.animator.advance()
+        if self.level != self._slide_target:
+            self._slide_target = self.level
+            self.animator.animate('slide', self.level, self.slide_duration, start=self.t)
+        self.animator.update()
+        self.t = self.animator.get('slide', self.t)
+
+    def update_highlight_target(self):
+        '''
+        Moves the highlight bar to the selected row as laid out by the
+        last scroll().
+        '''
+        boxes, indices = self.hit_index.get(self.level, (None, None))
+        target = None
+        if boxes is not None:
+            rows = np.flatnonzero(indices == self.selected[self.level])
+            if len(rows):
+                target = int(boxes[rows[0], 0])
+
+        if target != self._highlight_target:
+            if target is None or self._highlight_target is None:
+                self.animator.set('highlight', target)
+            else:
+                self.animator.animate('highlight', target, self.highlight_duration, easing='out_cubic')
+            self._highlight_target = target
+
+    def draw_highlight(self, img, offset=(0, 0)):
+        # img is the part of the frame starting at offset
+        row = self.animator.get('highlight')
+        if row is None or self.t != self.level:
+            return
+        row = int(row) - offset[0]
+        scale, spacing, _, _ = self.layout()
+        factor = self.render_factor()
+        top = max(row - spacing // 2 * factor, 0)
+        bottom = max(row + (scale * self.font.shape[1] + spacing // 2) * factor, 0)
+        left = max(max(self.nav_origin[1] - 8, 0) - offset[1], 0)
+        right = max(self.window_size_y - 8 - offset[1], 0)
+        bar = img[top:bottom, left:right]
+        if bar.size:
+            cv2.add(bar, HIGHLIGHT_COLOR, dst=bar)
+
+    def fade_to(self, opacity, duration=0.3):
+        '''
+        Fades the menu layer to opacity (0..1) over duration seconds.
+        '''
+        self.animator.animate('fade', opacity, duration, start=self.animator.get('fade', 1.0))
 
     def back(self):
         self.level -= 1
 
     def show_navigation(self):
-        items= []
-        level = self.level
-        
-        if level == 0:
-            items = [i[0] for i in self.nav_items]
-            
-        elif level >= 1:
-            element = self.nav_items[self.selected[0]][1]
-            if isinstance(element, list): # item is list
-                # get List Text elements
-                items = [i[0] for i in element]
-           
-                if level == 2:
-                    element[self.selected[1]][1]() # call function
-                    print("'{}' - function called".format(element[self.selected[1]][0]))
-                    self.level -= 1
-                
-            else:
-                 #item is function
-                 print("'{}' - function called".format(self.nav_items[self.selected[0]][0]))
-                 element() # call function
-                 self.level -= 1
+        self.ensure_depth(self.level + 1)
+
+        # Entering an entry that is not a menu runs it instead
+        if self.level > 0 and self.menu_at(self.level) is None:
+            parent = self.menu_at(self.level - 1)
+            index = self.selected[self.level - 1]
+            if parent is not None and 0 <= index < len(parent):
+                self.call(parent[index])
+            self.level -= 1
+
+        self.level = max(0, self.level)
+        while self.level > 0 and self.menu_at(self.level) is None:
+            self.level -= 1
+
+        count = len(self.menu_at(self.level))
+        self.selected[self.level] = max(0, min(self.selected[self.level], count-1))
+
+
+    def call(self, entry):
+        '''
+        Runs the callback of a menu entry. Callbacks in inline_callbacks
+        (and all callbacks when there is no executor) run right away,
+        everything else is submitted to the executor and the entry is
+        shown as busy until it finished. With a process pool callbacks
+        have to be picklable.
+        '''
+        name, callback = entry[0], entry[1]
+        print("'{}' - function called".format(name))
+        if self.executor is None or callback in self.inline_callbacks:
+            if self.timer is not None:
+                self.timer.mark('navigation')
+            callback()
+            if self.timer is not None:
+                self.timer.mark('callback')
+            return
+        if id(entry) in self.busy:
+            return
+
+        self.busy[id(entry)] = (entry, self.executor.submit(callback))
+        self.invalidate()
+
+    def poll_callbacks(self):
+        '''
+        Fires on_result / on_error for finished callbacks. Called from
+        show() so the hooks always run on the UI thread.
+        '''
+        done = [key for key, (_, future) in self.busy.items() if future.done()]
+        for key in done:
+            entry, future = self.busy.pop(key)
+            error = future.exception()
+            if error is not None:
+                if self.on_error is not None:
+                    self.on_error(entry[0], error)
+                else:
+                    print("'{}' - function failed".format(entry[0]))
+                    traceback.print_exception(type(error), error, error.__traceback__)
+            elif self.on_result is not None:
+                self.on_result(entry[0], future.result())
+        if done:
+            self.invalidate()
+
+    def post(self, fn, *args, key=None):
+        '''
+        Runs fn(*args) on the UI thread at the start of the next frame.
+        This (and the post_* helpers) is the only part of MiniUI that
+        may be called from other threads. Commands with the same key
+        are merged, see UpdateQueue.
+        '''
+        return self.updates.post(fn, args, key)
+
+    def post_label(self, entry, text):
+        return self.post(self.set_label, entry, text, key=('label', id(entry)))
+
+    def post_add(self, entry, items=None):
+        return self.post(self.add_entry, entry, items)
+
+    def post_remove(self, entry, items=None):
+        return self.post(self.remove_entry, entry, items)
+
+    def post_background(self, frame):
+        '''
+        Shows frame as background. The frame must not be changed after
+        posting it.
+        '''
+        return self.post(self.set_background_frame, frame, key=('background',))
+
+    def post_notification(self, text, duration=2.0):
+        return self.post(self.notify, text, duration, key=('notification',))
+
+    def apply_updates(self):
+        # Run the commands posted since the last frame
+        for fn, args in self.updates.drain(self.update_batch):
+            try:
+                fn(*args)
+            except Exception:
+                print("update '{}' - failed".format(getattr(fn, '__name__', fn)))
+                traceback.print_exc()
+
+    def set_label(self, entry, text):
+        entry[0] = text
+        self.menu_changed()
+
+    def add_entry(self, entry, items=None):
+        '''
+        Appends entry to items (default the top level), in front of
+        the Back button of submenus.
+        '''
+        items = self.nav_items if items is None else items
+        if isinstance(entry[1], list):
+            self.prepare_menu(entry[1])
+        if items and items[-1][1] == self.back:
+            items.insert(len(items) - 1, entry)
+        else:
+            items.append(entry)
+        self.menu_changed()
 
-        self.level = max(0, min(self.level, 1))
-        self.selected[self.level] = max(0, min(self.selected[self.level], len(items)-1))
+    def remove_entry(self, entry, items=None):
+        items = self.nav_items if items is None else items
+        items[:] = [e for e in items if e is not entry]
+        self.menu_changed()
 
-        for i, entry in enumerate(items):
-            col = 'g' if i == self.selected[self.level] else 'w'
-            pos = (self.nav_origin[0] + i * (self.nav_font_scale * 8 + self.nav_spacing), self.nav_origin[1])
-            self.put_text(self.ui, entry, pos, scale=self.nav_font_scale,
-                          color = col, centered = self.nav_centered)
+    def menu_changed(self):
+        # Entries were edited, an active filter has to be run again
+        self.drop_prefix_indices()
+        self.invalidate()
+        if self.filter_query is not None and self.filter_depth == self.level:
+            query, self.filter_query = self.filter_query, None
+            self.set_filter(query)
+
+    def set_background_frame(self, frame):
+        rows, cols = self.window_size_x, self.window_size_y
+        if frame.shape[:2] != (rows, cols):
+            frame = cv2.resize(frame, (cols, rows), interpolation=cv2.INTER_AREA)
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        self.bg = frame
+        self.invalidate()
+
+    def notify(self, text, duration=2.0):
+        '''
+        Shows text at the bottom of the window for duration seconds.
+        '''
+        self.notice = (text, self.animator.now + duration)
+        if self._notice_widget is None:
+            self._notice_widget = self.add_widget(
+                StatusText((self.window_size_x - 24, 8), self.notice_text, color='r'))
 
+    def notice_text(self):
+        text, until = self.notice
+        return text if self.animator.now < until else ""
+
+    def shutdown(self, wait=True):
+        if self.background is not None:
+            self.background.stop()
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+        if self.backend_open:
+            self.backend.close()
+            self.backend_open = False
 
     def handle_input(self):
+        if self.handle_filter_input():
+            return
+
         n, l=0, 0
         if self.key == ord('w'):
             n=-1
@@ -161,16 +1740,156 @@ class MiniUI(object):
         elif self.key == ord('a'):
             l=- 1
 
-        self.level=self.level + l
+        if self.filter_query is not None and self.level == self.filter_depth:
+            # Step through the matches only, and leave the filter when
+            # changing level
+            matches = self.filter_matches
+            if l > 0 and not matches:
+                l = 0
+            if n and matches:
+                position = bisect_left(matches, self.selected[self.level]) + n
+                self.selected[self.level] = matches[max(0, min(position, len(matches) - 1))]
+            n = 0
+            if l:
+                self.clear_filter()
+
+        self.level=max(0, self.level + l)
+        self.ensure_depth(self.level)
         self.selected[self.level]=self.selected[self.level] + n
 
+    def handle_filter_input(self):
+        '''
+        Type-ahead: '/' starts typing a filter for the current level,
+        letters, digits and space narrow it, backspace widens it, enter
+        stops typing (w/s/d then work on the matches) and escape clears
+        it. Returns True when the key was used by the filter.
+        '''
+        if self.key is None or self.key < 0:
+            return False
+        key = self.key & 0xFF
+        if not self.filter_typing:
+            if key == ord('/'):
+                self.filter_typing = True
+                self.set_filter("")
+                return True
+            if key == 27 and self.filter_query is not None:
+                self.clear_filter()
+                return True
+            return False
+
+        if key in (10, 13):
+            self.filter_typing = False
+        elif key == 27:
+            self.clear_filter()
+        elif key == 8:
+            self.set_filter(self.filter_query[:-1])
+        elif self.glyph_lut[key] >= 0:
+            self.set_filter(self.filter_query + chr(key).upper())
+        return True
 
-    def onMouse(self, event, x, y, flags, param):
-        FONT_HIGHT=8
-        self.selected[self.level]=(
-            y - self.nav_origin[0]) // (FONT_HIGHT * self.nav_font_scale + self.nav_spacing)
+    def set_filter(self, query):
+        '''
+        Shows only the entries of the current level whose label starts
+        with query (case insensitive).
+        '''
+        index = self.prefix_index(self.menu_at(self.level) or [])
+        narrowing = (self.filter_query is not None and self.filter_depth == self.level
+                     and query.startswith(self.filter_query))
+        lo, hi = self.filter_range if narrowing else (0, None)
+        self.filter_range = index.search(query, lo, hi)
+        self.filter_matches = index.matches(*self.filter_range)
+        self.filter_query = query
+        self.filter_depth = self.level
+
+        if self.filter_matches and self.selected[self.level] not in self.filter_matches:
+            self.selected[self.level] = self.filter_matches[0]
+        self.invalidate()
+
+    def clear_filter(self):
+        self.filter_query = None
+        self.filter_typing = False
+        self.filter_matches = []
+        self.filter_range = (0, None)
+        self.invalidate()
+
+    def prefix_index(self, items):
+        '''
+        Returns the (cached) PrefixIndex over the labels of items.
+        Labels are reduced to what put_text can draw. The index is kept
+        until drop_prefix_indices() is called for changed entries.
+        '''
+        key = (id(items), len(items))
+        cached = self._prefix_indices.get(id(items))
+        if cached is None or cached[0] != key:
+            labels = [self.drawable_text(entry[0]) for entry in items]
+            cached = self._prefix_indices[id(items)] = (key, PrefixIndex(labels))
+        return cached[1]
+
+    def drop_prefix_indices(self):
+        # Entries or their labels changed, filters need new indices
+        self._prefix_indices.clear()
+
+    def drawable_text(self, text):
+        '''
+        Returns text the way put_text shows it, in upper case.
+        '''
+        return text.upper()
+
+
+    def onMouse(self, event, x, y, flags, param, arrival=None):
+        # Only remember the event, show() applies it once per frame
         if event == cv2.EVENT_LBUTTONDOWN:
-            self.level += 1
+            self.mouse_clicks.append((x, y))
+        elif event == cv2.EVENT_MOUSEMOVE:
+            self.mouse_pos = (x, y)
+        else:
+            return
+        if self.recording is not None:
+            self.recording.mouse(event, x, y, flags)
+        self.trace_input(arrival)
+
+    def apply_mouse(self):
+        '''
+        Applies the mouse events since the last frame: the latest move
+        selects the hovered row if it is a different one than before,
+        clicks on a row select and enter it.
+        '''
+        if self.mouse_pos is not None:
+            hit = self.hit_test(*self.mouse_pos)
+            self.mouse_pos = None
+            if hit is not None and hit != self.hovered:
+                self.selected[self.level] = hit[1]
+            self.hovered = hit
+
+        while self.mouse_clicks:
+            hit = self.hit_test(*self.mouse_clicks.popleft())
+            if hit is not None:
+                self.selected[self.level] = hit[1]
+                if self.filter_query is not None:
+                    self.clear_filter()
+                self.level += 1
+                break
+
+    def hit_test(self, x, y):
+        '''
+        Returns (level, index) of the row under window position (x, y)
+        as laid out in the last frame, if it is on the current level.
+        '''
+        if self.plane is None:
+            return None
+        width = self._plane_width
+        column = x + self._plane_pos
+        depth = self._plane_base + column // width
+        if depth != self.level or depth not in self.hit_index:
+            return None
+        column %= width
+        boxes, indices = self.hit_index[depth]
+        inside = ((boxes[:, 0] <= y) & (y < boxes[:, 2]) &
+                  (boxes[:, 1] <= column) & (column < boxes[:, 3]))
+        hits = np.flatnonzero(inside)
+        if not len(hits):
+            return None
+        return depth, int(indices[hits[0]])
 
 
 
@@ -178,500 +1897,211 @@ class MiniUI(object):
         self.close_selected = True
 
     def put_text(self,img, text, pos, scale = 3, centered=False, color="w"):
+        label = self.render_label(text, scale, color)
+        x, y = pos
+        if centered:
+            y = int(y - len(text) * (self.glyph_atlas(scale).shape[2] + scale) / 2)
+        self.blit(img, label, x, y)
+        return x, y, x + label.shape[0], y + label.shape[1]
 
-        for i, str_char in enumerate(text):
-            order=ord(str_char.upper())
-            if order >= 65 and order <= 90:
-                index=ord(str_char.upper()) - 65
-            elif order >= 48 and order <= 57:
-                index=ord(str_char.upper()) - 22
-            elif order == 32:
-                index=37
-            else:
+    def render_label(self, text, scale=3, color="w", cache=True):
+        '''
+        Returns the finished bitmap of a label, rendering it only on a
+        label cache miss. Labels that change all the time should pass
+        cache=False.
+        '''
+        key = (text, scale, color)
+        label = self.labels.get(key)
+        if label is not None:
+            return label
+
+        # Indices first, looking them up may add glyphs to the font
+        indices = self.glyph_indices(text)
+        tiles = self.glyph_atlas(scale)[indices]
+        n, height, width = tiles.shape
+        cells = np.zeros((height, n, width + scale), dtype=np.uint8)
+        cells[:, :, :width] = tiles.transpose(1, 0, 2)
+        cells = cells.reshape(height, -1)
+        if cells.shape[1] == 0:
+            cells = np.zeros((height, 1), dtype=np.uint8)
+        label = cells[:, :, None] * COLOR_MASKS.get(color, COLOR_MASKS["w"])
+
+        if cache:
+            self.labels.put(key, label)
+        return label
+
+    def glyph_indices(self, text):
+        '''
+        Maps text to font glyph indices. Characters outside the lookup
+        table go through glyph_index().
+        '''
+        if text.isascii():
+            indices = self.glyph_lut[np.frombuffer(text.encode("ascii"), dtype=np.uint8)]
+            if (indices >= 0).all():
+                return indices
+        return np.array([self.glyph_index(char) for char in text], dtype=np.intp)
+
+    def glyph_index(self, char):
+        '''
+        Returns the glyph index of a single character. Characters the
+        font lacks are rasterized from a glyph page the first time they
+        are used, or drawn as '?' if no page has them.
+        '''
+        code = ord(char)
+        if code < len(self.glyph_lut) and self.glyph_lut[code] >= 0:
+            return self.glyph_lut[code]
+        index = self.glyph_map.get(code)
+        if index is not None:
+            return index
+
+        index = self.glyph_lut[ord('?')]
+        for page in self.glyph_pages:
+            if code in page:
+                glyph = page.glyph(code, self.font.shape[1:])
+                self.font = np.concatenate((self.font, glyph[None]))
+                index = len(self.font) - 1
                 break
+        self.glyph_map[code] = index
+        return index
 
-            char_resized=self.resize_char(self.font[index], self.nav_font_scale)
-            height, width=char_resized.shape[0], char_resized.shape[1]
-            if not centered:
-                x, y=pos[0], pos[1] + i * (char_resized.shape[1] + scale)
-            else:
-                x, y=pos[0], int(pos[1] + i * (char_resized.shape[1] +
-                                   scale) - len(text) * (char_resized.shape[1]+scale) / 2)
-            try:
-                if color == "b":
-                    img[x: x+height, y:y+width, 0] += char_resized
-                elif color == "g":
-                    img[x: x+height, y:y+width, 1] += char_resized
-                elif color == "r":
-                    img[x: x+height, y:y+width, 2] += char_resized
-                else:
-                    img[x: x+height, y:y+width, 0] += char_resized
-                    img[x: x+height, y:y+width, 1] += char_resized
-                    img[x: x+height, y:y+width, 2] += char_resized
-            except ValueError:
-                pass
+    def add_glyph_page(self, path, first, count, cell_width):
+        '''
+        Registers a bitmap page with the glyphs for the codepoints
+        first .. first + count - 1, cell_width pixels each. Nothing is
+        loaded until one of the characters is drawn.
+        '''
+        page = GlyphPage(path, first, count, cell_width)
+        self.glyph_pages.append(page)
+        fallback = self.glyph_lut[ord('?')]
+        replaced = {code for code in range(first, first + count)
+                    if self.glyph_map.get(code) == fallback}
+        if replaced:
+            # Labels drawn with '?' for these characters are stale now
+            for code in replaced:
+                del self.glyph_map[code]
+            self.labels.discard(lambda key: any(ord(char) in replaced for char in key[0]))
+            self.invalidate()
+        return page
+
+    def render_texts(self, img, texts, scale=None, centered=None):
+        '''
+        Draws many strings into img with a few array operations.
+
+        Parameters
+        ----------
+        img : target image (rows, cols, 3)
+        texts : [(text, (x, y), color), ...]
+        scale : glyph scale, defaults to nav_font_scale
+        centered : center texts on y, defaults to nav_centered
+        '''
+        scale = self.nav_font_scale if scale is None else scale
+        centered = self.nav_centered if centered is None else centered
+        width = self.font.shape[2] * scale
+
+        indices, xs, ys, masks = [], [], [], []
+        for text, (x, y), color in texts:
+            idx = self.glyph_indices(text)
+            if centered:
+                y = int(y - len(text) * (width + scale) / 2)
+            indices.append(idx)
+            xs.append(np.full(len(idx), x))
+            ys.append(y + np.arange(len(idx)) * (width + scale))
+            masks.append(np.tile(COLOR_MASKS.get(color, COLOR_MASKS["w"]), (len(idx), 1)))
+        if not indices:
+            return
+        indices = np.concatenate(indices)
+        if not len(indices):
+            return
+
+        # Gather glyph tiles and only scatter their lit pixels
+        tiles = self.glyph_atlas(scale)[indices]
+        n, r, c = np.nonzero(tiles)
+        rows = np.concatenate(xs)[n] + r
+        cols = np.concatenate(ys)[n] + c
+        inside = (rows >= 0) & (rows < img.shape[0]) & (cols >= 0) & (cols < img.shape[1])
+        n, r, c = n[inside], r[inside], c[inside]
+        values = tiles[n, r, c][:, None].astype(np.uint16) * np.concatenate(masks)[n]
+
+        # Sum overlapping pixels, then add saturating into the image
+        pixels = rows[inside] * img.shape[1] + cols[inside]
+        order = np.argsort(pixels, kind="stable")
+        pixels, values = pixels[order], values[order]
+        starts = np.flatnonzero(np.r_[True, pixels[1:] != pixels[:-1]])
+        rows, cols = np.divmod(pixels[starts], img.shape[1])
+        sums = np.add.reduceat(values, starts, axis=0) + img[rows, cols]
+        img[rows, cols] = np.minimum(sums, 255)
+
+    def blit(self, img, bitmap, x, y):
+        '''
+        Adds a bitmap into img at (x, y), clipped to the image bounds.
+        '''
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + bitmap.shape[0], img.shape[0])
+        y1 = min(y + bitmap.shape[1], img.shape[1])
+        if x0 >= x1 or y0 >= y1:
+            return
+        region = img[x0:x1, y0:y1]
+        cv2.add(region, bitmap[x0-x:x1-x, y0-y:y1-y], dst=region)
 
     def resize_char(self, char, factor):
-        outp=np.zeros( (char.shape[0] * factor, char.shape[1] * factor) , dtype=np.uint8)
-        for x, y in np.ndindex(char.shape):
-            outp[factor*x:factor*x+factor, factor *
-                 y:factor*y+factor] = char[x, y]
-        return outp
-
-    def load_font(self):
-        self.font = np.array([[[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ]],
-        
-        [[1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ]],
-        
-        [[1 , 1 , 1 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 1 , 0 , 0 ],
-        [1 , 1 , 0 , 0 , 0 ],
-        [1 , 0 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ]],
-        
-        [[1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ]],
-        
-        [[1 , 0 , 0 , 0 , 1 ],
-        [1 , 1 , 0 , 1 , 1 ],
-        [1 , 0 , 1 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ]],
-        
-        [[1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 0 , 1 , 0 ],
-        [1 , 0 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 1 , 0 , 0 ],
-        [0 , 1 , 0 , 1 , 0 ]],
-        
-        [[1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 1 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ]],
-        
-        [[1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [0 , 1 , 0 , 1 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ]],
-        
-        [[1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 0 , 0 , 1 ],
-        [1 , 0 , 1 , 0 , 1 ],
-        [1 , 0 , 1 , 0 , 1 ],
-        [0 , 1 , 0 , 1 , 0 ]],
-        
-        [[1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ]],
-        
-        [[1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 1 , 1 , 0 ],
-        [1 , 1 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 1 , 0 , 0 , 0 ],
-        [1 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 0 , 1 , 1 , 0 ],
-        [0 , 1 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 1 , 1 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 0 , 1 , 1 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 0 , 0 , 0 , 0 ],
-        [1 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[1 , 1 , 1 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 1 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ],
-        [0 , 1 , 0 , 0 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 1 , 1 , 0 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [0 , 0 , 0 , 1 , 0 ],
-        [1 , 0 , 0 , 1 , 0 ],
-        [0 , 1 , 1 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]],
-        
-        [[0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ],
-        [0 , 0 , 0 , 0 , 0 ]]]).astype(np.uint8) * 255
-        
-       
+        '''
+        Upscales a glyph (or a stack of glyphs) by an integer factor
+        using nearest neighbour repetition along the last two axes.
+        '''
+        return char.repeat(factor, axis=-2).repeat(factor, axis=-1)
+
+    def glyph_atlas(self, scale=None):
+        '''
+        Returns all glyphs of the font upscaled by scale (defaults to
+        nav_font_scale).
+
+        Each atlas is built once per scale and all of them are dropped
+        when the font changes.
+        '''
+        if self._atlas_font is not self.font:
+            self._atlases = {}
+            self._atlas_font = self.font
+        scale = self.nav_font_scale if scale is None else scale
+        atlas = self._atlases.get(scale)
+        if atlas is None:
+            atlas = self._atlases[scale] = self.resize_char(self.font, scale)
+        return atlas
+
+    def load_font(self, path=None):
+        '''
+        Loads a font built by font_conv.py. The file is memory mapped,
+        glyph bitmaps are only read when an atlas is built.
+        '''
+        glyphs = np.load(path or FONT_PATH, mmap_mode='r')
+        self.font = glyphs['bitmap']
+        self.font_codepoints = glyphs['codepoint']
+        self._atlases = {}
+        self._atlas_font = None
+        self.labels.clear()
+
+        # Codepoint -> glyph index, a table for Latin-1 and a sparse map
+        # for everything else (filled lazily from the glyph pages)
+        codepoints = np.asarray(self.font_codepoints)
+        latin = codepoints < 256
+        self.glyph_lut = np.full(256, -1, dtype=np.intp)
+        self.glyph_lut[codepoints[latin]] = np.flatnonzero(latin)
+        self.glyph_map = {int(c): i for i, c in enumerate(codepoints) if c >= 256}
+        if not hasattr(self, 'glyph_pages'):
+            self.glyph_pages = []
+
+        # Lower case letters fall back to upper case glyphs
+        lower = np.arange(ord('a'), ord('z') + 1)
+        missing = lower[self.glyph_lut[lower] < 0]
+        self.glyph_lut[missing] = self.glyph_lut[missing - 32]
+
+        # Redraw everything with the new glyphs (not yet set up on the
+        # first call from __init__)
+        if hasattr(self, '_nav_version'):
+            self.plane = None
+            self.drop_prefix_indices()
+            self.invalidate()
+
 
-import time
 def demo1():
     t1 = time.time()
     for x,y in np.ndindex(100,10):
@@ -688,29 +2118,36 @@ def demo3():
     print(f'{100*100} ops - Processing Time:{(t2 - t1)*1000}ms ' )
 
 def demo2():
+    import imageio
     path = os.path.realpath(os.path.join(os.path.dirname(__file__), "error.png"))
     source = imageio.imread(path)
     cv2.imshow(f"Image{np.random.randint(1000)}", source)
     
 def main():
-    ui = MiniUI()
+    ui = MiniUI(report_startup='--startup' in sys.argv)
+    if '--latency' in sys.argv:
+        ui.enable_latency()
+    if '--record' in sys.argv:
+        ui.start_recording(sys.argv[sys.argv.index('--record') + 1])
     ui.add(['Demo 1', demo1])
     ui.add(['More', [['Demo 2', demo2], ['Demo 3', demo3]]])
     ui.add(['Settings', [['General', demo2], ['Graphics', demo2], ['Controlls', demo2], ['Audio', demo2]]])
     ui.add(['Exit', ui.close])
+    if '--background' in sys.argv:
+        ui.set_background(sys.argv[sys.argv.index('--background') + 1])
+
+    # demo2 opens HighGUI windows, which must happen on the UI thread
+    ui.inline_callbacks.add(demo2)
     
-    
-    
-    key = None
-    while (key != ord('x')):
-        key = cv2.waitKey(30)
-        
-        ret = ui.show(key)
-  
-        if ret == 'exit':
-            break
-        
+    if '--replay' in sys.argv:
+        ui.replay(sys.argv[sys.argv.index('--replay') + 1], realtime=True)
+    else:
+        ui.run()
+    ui.stop_recording()
+    ui.shutdown()
     cv2.destroyAllWindows()
+    if ui.latency is not None:
+        ui.latency.print_report()
 
 
 if __name__ == "__main__":
@@ -8,7 +8,7 @@ a = Analysis(
     ['mini-ui.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('font.npy', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},